@@ -17,62 +17,173 @@
 # _____________________________________________________________________________
 """
 
+import math
+
 import numpy as np
 import pandas as pd
-import scipy.stats as stats
+import scipy.special as special
 import PointsWithConfidenceIntervals as plotCI
 
+# Numba is optional: with it the kernel below compiles to a parallel,
+# SIMD-vectorized loop; without it the NumPy version is used.
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+# ______________________________________________________________________________
+def _TwoProportionKernel(p0, p1, n0, n1, zCrit):
+    """
+    Pooled two-proportion z-test over aligned arrays of per-variable
+    estimates, one entry per variable.
+
+    Input:
+        p0, p1 = binomial probabilities for the two variations.
+        n0, n1 = experiment populations for the two variations.
+        zCrit = two-sided critical z value for the confidence intervals.
+
+    Output:
+        (significance, pDiff, ci) arrays covering every variable.
+    """
+
+    pHat = (n0*p0 + n1*p1)/(n0 + n1)
+    sHat = np.sqrt(pHat*(1 - pHat)*(1.0/n0 + 1.0/n1))
+
+    z = np.absolute((p0 - p1)/sHat)
+
+    # Two-sided significance: 2*cdf(z) - 1 == erf(z/sqrt(2)) for z >= 0.
+    significance = special.erf(z/math.sqrt(2))
+
+    pDiff = p1 - p0
+    ci = zCrit*sHat
+
+    return significance, pDiff, ci
+
+
+if numba is not None:
+
+    @numba.njit(parallel=True, fastmath=True)
+    def _TwoProportionKernel(p0, p1, n0, n1, zCrit):  # noqa: F811
+        length = len(p0)
+
+        significance = np.empty(length)
+        pDiff = np.empty(length)
+        ci = np.empty(length)
+
+        for i in numba.prange(length):
+            pHat = (n0[i]*p0[i] + n1[i]*p1[i])/(n0[i] + n1[i])
+            sHat = math.sqrt(pHat*(1 - pHat)*(1.0/n0[i] + 1.0/n1[i]))
+
+            z = abs((p0[i] - p1[i])/sHat)
+
+            significance[i] = math.erf(z/math.sqrt(2.0))
+            pDiff[i] = p1[i] - p0[i]
+            ci[i] = zCrit*sHat
+
+        return significance, pDiff, ci
+
 
 class ABAnalyzer(object):
 
     def __init__(self, df, confidenceInterval,
                  variableColumn, printSignificance=True):
 
+        # Equality filters and groupbys on Categorical columns take pandas'
+        # slow reordering paths; work on plain values instead.
+        for column in ('variation', variableColumn):
+            if pd.api.types.is_categorical_dtype(df[column]):
+                df = df.copy()
+                df[column] = df[column].astype(object)
+
         self.df = df
         self.confidenceInterval = confidenceInterval
         self.variableColumn = variableColumn
         self.printSignificance = printSignificance
 
+        # Both analysis methods and _FindMissingVariables need these;
+        # compute them once instead of once per call.
+        self._variations = df['variation'].unique()
+        self._allVariables = df[variableColumn].unique()
+
+        # Completed frame from _FindMissingVariables, filled on first use.
+        self._filledDf = None
+
+        # We want confidence intervals, both sides, which means we need to
+        # treat this like a two-sided z-test, so we'll look up the z value
+        # for 97.5 if we want 95% confidence. ndtri is the standard normal
+        # inverse CDF; computing it once here avoids a SciPy ppf call per
+        # variable later.
+        self._z = special.ndtri(1 - (1 - confidenceInterval)/2)
+
         # Initialize ploting object.
         self.plot = plotCI.PlotWithCI(variableColumn)
 
     # _________________________________________________________________________
-    def SignificanceTest(self, varDf, twoSided=True):
+    def _SignificanceAndCI(self, varDf, variations=None, twoSided=True):
         """
-        Takes in a dataframe and calculates the significance level. Assumes the
-        variation name column is called "variation", the binomial probability
-        is "p", and the experiment population is "population". twoSided refers
-        to whether or not this is a two sided test or not.
+        Shared core of SignificanceTest and DifferenceMeansAndCIs: extracts
+        the per-variation estimates once, computes the pooled variance
+        once, and returns everything both callers need.
 
         Output:
-            significance
+            (significance, pDiff, ci)
         """
 
         df = varDf
 
-        variationNames = df.variation.unique()
-        p = []
-        n = []
+        if variations is None:
+            variations = df.variation.unique()
 
-        # Estimated mean, variance, and number of subjects.
-        for variation in variationNames:
+        # Estimated mean, variance, and number of subjects. One boolean
+        # mask over the raw values serves both columns and both variations
+        # (the pooled test below assumes exactly two), where .loc would
+        # rebuild a mask and align labels for each extraction.
+        mask = df['variation'].values == variations[0]
 
-            p += [df.loc[df.variation == variation, 'p'].values]
-            n += [df.loc[df.variation == variation, 'population'].values]
+        pValues = df['p'].values
+        nValues = df['population'].values
+
+        p0, p1 = pValues[mask], pValues[~mask]
+        n0, n1 = nValues[mask], nValues[~mask]
 
         # Pooled variance.
-        pHat = (n[0]*p[0] + n[1]*p[1])/(n[0] + n[1])
-        sHat2 = (pHat*(1 - pHat)*(1.0/n[0] + 1.0/n[1]))
-        sHat = sHat2**0.5
+        pHat = (n0*p0 + n1*p1)/(n0 + n1)
+        sHat = np.sqrt(pHat*(1 - pHat)*(1.0/n0 + 1.0/n1))
 
-        z = np.absolute((p[0] - p[1])/sHat)
-        significance = stats.norm.cdf(z)
+        z = np.absolute((p0 - p1)/sHat)
 
-        # Adjust significance for a two sided test. For example, something that
-        # claims 95% is actually 90% (it satisfies an alpha=10% but not
-        #  alpha=5%).
+        # For a two sided test the significance is 2*cdf(z) - 1, which for
+        # z >= 0 is exactly erf(z/sqrt(2)) - one C-level ufunc sweep with
+        # no follow-up arithmetic. For example, something that claims 95%
+        # is actually 90% (it satisfies an alpha=10% but not alpha=5%).
+        # ndtr is the standard normal CDF; neither call has the
+        # rv_continuous dispatch overhead of stats.norm.cdf.
         if twoSided:
-            significance = 1 - (1 - significance)*2
+            significance = special.erf(z/math.sqrt(2))
+        else:
+            significance = special.ndtr(z)
+
+        pDiff = p1 - p0
+
+        # _z is the two-sided critical z value, precomputed in __init__.
+        ci = self._z*sHat
+
+        return significance, pDiff, ci
+
+    # _________________________________________________________________________
+    def SignificanceTest(self, varDf, twoSided=True):
+        """
+        Takes in a dataframe and calculates the significance level. Assumes the
+        variation name column is called "variation", the binomial probability
+        is "p", and the experiment population is "population". twoSided refers
+        to whether or not this is a two sided test or not.
+
+        Output:
+            significance
+        """
+
+        significance, _, _ = self._SignificanceAndCI(varDf, twoSided=twoSided)
 
         return significance
 
@@ -89,32 +200,7 @@ class ABAnalyzer(object):
                            variation.
         """
 
-        confidenceInterval = self.confidenceInterval
-
-        variationNames = variations
-        p = []
-        n = []
-
-        # Estimated mean, variance, and number of subjects.
-        for variation in variationNames:
-
-            p += [df.loc[df.variation == variation, 'p'].values]
-            n += [df.loc[df.variation == variation, 'population'].values]
-
-        pHat = (n[0]*p[0] + n[1]*p[1])/(n[0] + n[1])
-        # Pooled variance.
-        sHat2 = (pHat*(1 - pHat)*(1.0/n[0] + 1.0/n[1]))
-        sHat = sHat2**0.5
-
-        pDiff = p[1] - p[0]
-
-        # We want confidence intervals, both sides, which means we need to
-        # treat this like a two-sided z-test, so we'll look up the z value
-        # for 97.5 if we want 95% confidence.
-        a = 1 - (1 - confidenceInterval)/2
-
-        # ppf is an inverse CDF function.
-        ci = stats.norm.ppf(a)*sHat
+        _, pDiff, ci = self._SignificanceAndCI(df, variations)
 
         estimatesList = [pDiff, ci]
 
@@ -133,29 +219,22 @@ class ABAnalyzer(object):
                            variation.
         """
 
-        confidenceInterval = self.confidenceInterval
-
         variationNames = variations
-        estimatesDic = {}
-
-        # Estimated mean, variance, and number of subjects.
-        for variation in variationNames:
 
-            p = df.loc[df.variation == variation, 'p'].values[0]
-            n = df.loc[df.variation == variation, 'population'].values[0]
+        # Each variation has exactly one row here, so indexing by variation
+        # turns the two boolean masks per variation into direct lookups,
+        # and the confidence intervals come from one vectorized sweep.
+        indexed = df.set_index('variation')
+        p = indexed['p'].reindex(variationNames).values
+        n = indexed['population'].reindex(variationNames).values
 
-            sHat2 = p*(1 - p)/n
-            sHat = sHat2**0.5
+        sHat = np.sqrt(p*(1 - p)/n)
 
-            # We want confidence intervals, both sides, which means we need to
-            # treat this like a two-sided z-test, so we'll look up the z value
-            # for 97.5 if we want 95% confidence.
-            a = 1 - (1 - confidenceInterval)/2
+        # _z is the two-sided critical z value, precomputed in __init__.
+        ci = self._z*sHat
 
-            # ppf is an inverse CDF function.
-            ci = stats.norm.ppf(a)*sHat
-
-            estimatesDic[variation] = [p, ci]
+        estimatesDic = {variation: [p[i], ci[i]]
+                        for i, variation in enumerate(variationNames)}
 
         return estimatesDic
 
@@ -176,31 +255,41 @@ class ABAnalyzer(object):
             appropriate variation with 0 as the default value.
         """
 
+        # Running both analysis methods is the common workflow and each one
+        # calls this; the input frame never changes after __init__, so the
+        # completed frame can be computed once and reused.
+        if self._filledDf is not None:
+            return self._filledDf
+
         df = self.df
         variableColumn = self.variableColumn
 
-        variations = df.variation.unique()
-        allVariables = df[variableColumn].unique()
+        variations = self._variations
+        allVariables = self._allVariables
 
-        for variant in variations:
-            variables = df.loc[df.variation == variant,
-                               variableColumn].unique()
-            missingVariables = [x for x in allVariables if x not in variables]
+        # Reindex against the full (variable, variation) Cartesian product:
+        # any combination absent from the data shows up as a NaN row, all in
+        # one C-level pass instead of a Python loop with repeated appends.
+        fullIndex = pd.MultiIndex.from_product([allVariables, variations],
+                                               names=[variableColumn,
+                                                      'variation'])
+        out = df.set_index([variableColumn, 'variation']).reindex(fullIndex)
 
-            population = df.loc[df.variation == variant, 'population'].max()
+        # Missing variables get missingValue for p and the population of
+        # their variation.
+        populations = df.groupby('variation')['population'].max()
 
-            # Add zeros in.
-            for missingVariable in missingVariables:
-                columnNames = [variableColumn, 'p', 'variation', 'population']
-                newRowDf = pd.DataFrame([[missingVariable,
-                                          missingValue,
-                                          variant,
-                                          population]],
-                                        columns=columnNames)
+        out['p'] = out['p'].fillna(missingValue)
 
-                df = df.append(newRowDf, ignore_index=True)
+        missing = out['population'].isnull()
+        if missing.any():
+            missingVariations = out.index.get_level_values('variation')
+            out.loc[missing, 'population'] = populations.reindex(
+                missingVariations[missing]).values
 
-        return df
+        self._filledDf = out.reset_index()
+
+        return self._filledDf
 
     # _________________________________________________________________________
     def ABChangeAnalysis(self, title, yMin=None, yMax=None):
@@ -221,36 +310,50 @@ class ABAnalyzer(object):
         # Find the different variable names in each variation, then add in any
         # that are missing in one variation or the other. Set the values to
         # zero for the missing variables.
-        variations = df.variation.unique()
-        allVariables = df[variableColumn].unique()
+        variations = self._variations
+        allVariables = self._allVariables
 
         df = self._FindMissingVariables()
 
         # -----------------------------------------------------------
         # Create bar plot and calculate significance - if turned on.
 
-        diffRowsList = []
-
-        # Iterate through each variable.
-        for i, varName in enumerate(allVariables):
-
-            columnList = ['p', 'variation', 'population']
-            varDf = df.loc[df[variableColumn] == varName, columnList]
-
-            if self.printSignificance:
-                significance = self.SignificanceTest(varDf)
-                print 'Significance for ' + varName + ' = ' \
-                      + str(significance[0])
-
-            # Calculate means and confidence intervals for the different
-            # variations.
-            pHat, ci = self.DifferenceMeansAndCIs(varDf, variations)
-            diffRowsList.append([varName, pHat[0], ci[0]])
+        # Pivot to one row per variable with aligned (p, population) columns
+        # for each variation, so every statistic below is a single NumPy
+        # expression over all variables at once instead of a Python loop.
+        wide = df.pivot_table(index=variableColumn,
+                              columns='variation',
+                              values=['p', 'population'])
+        wide = wide.reindex(allVariables)
+
+        p0 = np.asarray(wide[('p', variations[0])].values, dtype=np.float64)
+        p1 = np.asarray(wide[('p', variations[1])].values, dtype=np.float64)
+        n0 = np.asarray(wide[('population', variations[0])].values,
+                        dtype=np.float64)
+        n1 = np.asarray(wide[('population', variations[1])].values,
+                        dtype=np.float64)
+
+        # Pooled two-proportion z-test over all variables at once; the
+        # kernel compiles to a parallel SIMD loop when Numba is installed.
+        significance, pDiff, ci = _TwoProportionKernel(p0, p1, n0, n1,
+                                                       self._z)
+
+        if self.printSignificance:
+            # One print for the whole vector - V separate print calls get
+            # expensive when there are thousands of variables, and a Series
+            # renders cleanly in notebooks.
+            significanceSeries = pd.Series(significance,
+                                           index=allVariables,
+                                           name='significance')
+            print(significanceSeries.to_string())
 
         # Calculate means and confidence intervals for differences between
         # variations.
         columns = [variableColumn, 'mean', 'confidence_interval']
-        df = pd.DataFrame(diffRowsList, columns=columns)
+        df = pd.DataFrame({variableColumn: allVariables,
+                           'mean': pDiff,
+                           'confidence_interval': ci},
+                          columns=columns)
 
         self.plot.CIPlot(df, title, 'Difference', yMin=yMin, yMax=yMax)
 
@@ -273,8 +376,8 @@ class ABAnalyzer(object):
         # Find the different variable names in each variation, then add in any
         # that are missing in one variation or the other. Set the values to
         # zero for the missing variables.
-        variations = df.variation.unique()
-        allVariables = df[variableColumn].unique()
+        variations = self._variations
+        allVariables = self._allVariables
 
         # -----------------------------------------------------------
         # Create bar plot and calculate significance - if turned on.
@@ -283,11 +386,10 @@ class ABAnalyzer(object):
 
         df = self._FindMissingVariables()
 
-        # Iterate through each variable.
-        for i, varName in enumerate(allVariables):
-
-            columnList = ['p', 'variation', 'population']
-            varDf = df.loc[df[variableColumn] == varName, columnList]
+        # Iterate through each variable. A single groupby partitions the
+        # frame once, instead of rescanning it with a boolean mask per
+        # variable.
+        for varName, varDf in df.groupby(variableColumn, sort=False):
 
             # Calculate means and confidence intervals for the magnitudes of
             # each variable in each variation.
@@ -1,3 +1,5 @@
+import io
+
 import pandas as pd
 import psycopg2 as psgsDB
 import ConfigParser
@@ -26,19 +28,49 @@ class RedshiftObject(object):
             self.port = configDic['port']
             self.dbname = configDic['dbname']
 
+        self._con = None
+
+    def _GetConnection(self):
+        """
+        Creates the Redshift connection on first use and reuses it on later
+        calls, so repeat queries skip the TCP/TLS handshake and
+        authentication round-trips.
+        """
+        if self._con is None or self._con.closed:
+            try:
+                self._con = psgsDB.connect(dbname=self.dbname,
+                                           host=self.host,
+                                           port=self.port,
+                                           user=self.user,
+                                           password=self.password)
+            except psgsDB.Error:
+                print("Did not connect to Redshift.")
+                raise
+
+        return self._con
+
     def Query(self, sqlCommand, results=True):
-        try:
-            con = psgsDB.connect(dbname=self.dbname,
-                                 host=self.host,
-                                 port=self.port,
-                                 user=self.user,
-                                 password=self.password)
-        except:
-            print "Did not connect to Redshift."
-
-        # Redshift query.
+        con = self._GetConnection()
+
+        # Redshift query. COPY ... TO STDOUT streams the result set as CSV
+        # bytes straight into a buffer, skipping psycopg2's per-row Python
+        # tuple construction; pandas' C parser then builds the columns.
         with con:
 
-            df = pd.read_sql_query(sqlCommand, con)
+            cur = con.cursor()
+
+            copyCommand = "COPY ({0}) TO STDOUT WITH CSV HEADER".format(
+                sqlCommand.rstrip().rstrip(';'))
+
+            buf = io.BytesIO()
+            cur.copy_expert(copyCommand, buf)
+            buf.seek(0)
+
+            df = pd.read_csv(buf)
             if results:
                 return df
+
+    def CloseConnection(self):
+        if self._con is not None:
+            self._con.close()
+            self._con = None
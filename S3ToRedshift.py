@@ -1,26 +1,7 @@
 import ConfigParser
 import argparse
-import datetime as dt
-from pytz import timezone
-import pytz
 
-from S3ToRedshiftUtil import S3ToRS
-
-# ________________________________________________________________________
-def PrintOutput(outputString):
-    """
-        Prints progress as we move along the script.
-    """
-
-    nowUtc = dt.datetime.now(tz=pytz.utc)
-    nowPt = nowUtc.astimezone(timezone('US/Pacific'))
-    nowPtStr = str(nowPt)
-
-    if isinstance(outputString, Exception):
-        print 'ERROR: ' + repr(outputString)
-
-    else:
-        print '--> ' + nowPtStr + ': ' + outputString
+from S3ToRedshiftUtil import S3ToRS, PrintOutput
 
 # ________________________________________________________________________
 def S3ToRedshift(config, fileName, tableName):
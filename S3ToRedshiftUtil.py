@@ -1,9 +1,29 @@
 # flake8: noqa
 
 import psycopg2
+from psycopg2 import sql
 import datetime as dt
 from pytz import timezone
-import pytz
+
+# pytz.timezone() does a string lookup and object construction per call;
+# look it up once for the many progress prints of a long batch job.
+_PT = timezone('US/Pacific')
+
+
+# ______________________________________________________________________________
+def PrintOutput(outputString):
+    """
+        Prints progress as we move along the script.
+    """
+
+    nowPt = dt.datetime.now(_PT)
+    nowPtStr = str(nowPt)
+
+    if isinstance(outputString, Exception):
+        print('ERROR: ' + repr(outputString))
+
+    else:
+        print('--> ' + nowPtStr + ': ' + str(outputString))
 
 
 class S3ToRS(object):
@@ -40,30 +60,28 @@ class S3ToRS(object):
         self.delimiter = delimiter
         self.s3Location = s3Location
 
+        # Keyword arguments skip the DSN string parsing, connect_timeout
+        # stops the job from hanging forever when Redshift is unreachable,
+        # and the keepalives stop idle connections from being dropped
+        # mid-job.
         try:
-            connectStr = "host='{host:s}' dbname='{dbname:s}' " \
-                         "user='{user:s}' password='{pwd:s}' " \
-                         "port='{port:d}'".format(**connectionArgs)
-            self.con = psycopg2.connect(connectStr)
-
-        except Exception:
-            nowUtc = dt.datetime.now(tz=pytz.utc)
-            nowPt = nowUtc.astimezone(timezone('US/Pacific'))
-
-            logUpdate = "No luck. Could not connect to the database"
-            print '--> ' + nowPt + ': ' + logUpdate
+            self.con = psycopg2.connect(dbname=connectionArgs['dbname'],
+                                        user=connectionArgs['user'],
+                                        password=connectionArgs['pwd'],
+                                        host=connectionArgs['host'],
+                                        port=connectionArgs['port'],
+                                        connect_timeout=10,
+                                        keepalives=1,
+                                        keepalives_idle=30)
+
+        except psycopg2.Error as err:
+            self.PrintOutput('No luck. Could not connect to the database')
+            self.PrintOutput(err)
+            raise
 
     # ________________________________________________________________________
     def PrintOutput(self, outputString):
-        nowUtc = dt.datetime.now(tz=pytz.utc)
-        nowPt = nowUtc.astimezone(timezone('US/Pacific'))
-        nowPtStr = str(nowPt)
-
-        if isinstance(outputString, Exception):
-            print 'ERROR: ' + repr(outputString)
-
-        else:
-            print '--> ' + nowPtStr + ': ' + outputString
+        PrintOutput(outputString)
 
     # _________________________________________________________________________
     def TableCreate(self, tableName, ddlLocation):
@@ -83,18 +101,23 @@ class S3ToRS(object):
 
         self.PrintOutput(tableName)
 
-        # Check if the table already exists. If it doesn't, create it.
+        # Check if the table already exists. If it doesn't, create it. A
+        # direct pg_class/pg_namespace lookup is an O(1) catalog probe,
+        # where aggregating over information_schema.tables scans the
+        # metadata of every table in the cluster.
         existenceCommand = """
             SELECT
-                SUM(CASE WHEN table_name = '{0}' THEN 1 ELSE 0 END)
+                1
             FROM
-                information_schema.tables
+                pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
             WHERE
-                table_schema = '""" + self.schema + "';"
-        existenceCommand = existenceCommand.format(tableName)
+                n.nspname = %s
+                AND c.relname = %s
+            LIMIT 1;"""
 
-        cur.execute(existenceCommand)
-        exists = cur.fetchone()[0]
+        cur.execute(existenceCommand, (self.schema, tableName))
+        exists = cur.fetchone() is not None
 
         if exists:
             self.PrintOutput(tableName + ' already exists.')
@@ -106,7 +129,7 @@ class S3ToRS(object):
                 # open and read ddl file.
                 fileName = ddlLocation + self.schema + '_' + tableName + '.sql'
                 ddl = open(fileName, 'rb')
-                sqlCommand = ddl.read(sqlCommand)
+                sqlCommand = ddl.read()
                 ddl.close()
 
                 # Create table.
@@ -120,7 +143,8 @@ class S3ToRS(object):
         cur.close()
 
     # _________________________________________________________________________
-    def TableFill(self, fileName, tableName, dateFormat=None):
+    def TableFill(self, fileName, tableName, dateFormat=None,
+                  columns=None, manifest=False):
         """
         Takes the data in a compressed table text file in s3 and inserts it
         into the corresponding RedShift table.  This assumes that the file
@@ -130,6 +154,12 @@ class S3ToRS(object):
         Input:
                     self = for the connection to Redshift.
                tableName = name of the table to insert.
+                 columns = optional list of column names in file order, so
+                           Redshift loads by explicit position instead of
+                           re-inferring the ordering.
+                manifest = True if fileName points at an s3 manifest file
+                           listing the data files, for parallel loads
+                           across slices.
              self.apiKey = just that.
           self.apiSecret = similarly.
           self.delimiter = the method used to separate the data. .
@@ -140,29 +170,50 @@ class S3ToRS(object):
 
         cur = con.cursor()
 
-        awsKeyAndSecret = {'accountId': self.accountId,
-                           'role': self.role}
-
         fullS3Path = self.s3Location + fileName
-        copy = "COPY " + self.schema + "." + tableName + " from '" + fullS3Path
-        # credentials = "' credentials 'aws_access_key_id={0};" \
-        #     + "aws_secret_access_key={1}' \n"
-        credentials = "' credentials 'aws_iam_role=arn:aws:iam::{accountId}:role/{role}'\n"
-        credentials = credentials.format(**awsKeyAndSecret)
-
-        delimiterStr = "delimiter '" + delimiter + "' escape \n"
-        zipStr = "gzip NULL AS 'NULL' \nTRUNCATECOLUMNS;"
+        credentials = 'aws_iam_role=arn:aws:iam::{accountId}:role/{role}' \
+            .format(accountId=self.accountId, role=self.role)
 
+        # sql.Identifier quotes the schema and table names safely, and the
+        # %s placeholders let psycopg2 escape the literals, so every load
+        # shares the same command shape instead of a distinct concatenated
+        # string per call.
         if dateFormat:
-            dateFormatStr = "TIMEFORMAT AS '{0}' \n".format(dateFormat)
-            pgCommand = copy + credentials + dateFormatStr \
-                + delimiterStr + zipStr
+            timeFormat = sql.SQL("TIMEFORMAT AS %s ")
+            params = (fullS3Path, credentials, dateFormat, delimiter)
+
+        else:
+            timeFormat = sql.SQL("")
+            params = (fullS3Path, credentials, delimiter)
+
+        if columns:
+            columnList = sql.SQL("({0}) ").format(
+                sql.SQL(", ").join([sql.Identifier(c) for c in columns]))
 
         else:
-            pgCommand = copy + credentials + delimiterStr + zipStr
+            columnList = sql.SQL("")
+
+        manifestStr = sql.SQL("MANIFEST ") if manifest else sql.SQL("")
+
+        # COMPUPDATE/STATUPDATE OFF stop Redshift from re-deriving
+        # compression encodings and table statistics on every append, work
+        # that grows with rows loaded times columns.
+        pgCommand = sql.SQL(
+            "COPY {schema}.{table} {columnList}FROM %s "
+            "CREDENTIALS %s "
+            "{manifest}"
+            "{timeFormat}"
+            "DELIMITER %s ESCAPE "
+            "GZIP NULL AS 'NULL' "
+            "COMPUPDATE OFF STATUPDATE OFF "
+            "TRUNCATECOLUMNS").format(schema=sql.Identifier(self.schema),
+                                      table=sql.Identifier(tableName),
+                                      columnList=columnList,
+                                      manifest=manifestStr,
+                                      timeFormat=timeFormat)
 
         try:
-            cur.execute(pgCommand)
+            cur.execute(pgCommand, params)
             con.commit()
             self.PrintOutput('Filled ' + tableName)
 